@@ -0,0 +1,28 @@
+import os
+
+# Read the environment exactly once at import; every later access is a
+# plain module attribute lookup. Defaults match the docker-compose
+# setup in sample-data/ and central-platform/.
+HOSPITAL_DB = {
+    "host": os.getenv("HOSPITAL_DB_HOST", "localhost"),
+    "port": os.getenv("HOSPITAL_DB_PORT", "5433"),
+    "database": os.getenv("HOSPITAL_DB_NAME", "hospital"),
+    "user": os.getenv("HOSPITAL_DB_USER", "hospital_user"),
+    "password": os.getenv("HOSPITAL_DB_PASSWORD", "hospital_pass")
+}
+
+# Upper bound on pooled connections per worker process; size it so
+# workers x pool stays under the server's max_connections
+DB_POOL_SIZE = int(os.getenv("HOSPITAL_DB_POOL_SIZE", "20"))
+
+# How many idle connections the pool keeps warm. psycopg2 closes any
+# returned connection once the pool already holds minconn, so this
+# should match steady-state concurrency (the per-table drain and the
+# full sync each fan out across the three clinical tables) or the
+# overlapped paths re-handshake on every checkout.
+DB_POOL_MIN = int(os.getenv("HOSPITAL_DB_POOL_MIN", "4"))
+
+CENTRAL_API_URL = os.getenv("CENTRAL_API_URL", "http://localhost:8001")
+API_TOKEN = os.getenv("CARELOCK_API_TOKEN", "CARELOCK_SECURE_TOKEN_123")
+TENANT_ID = os.getenv("CARELOCK_TENANT_ID", "hospital-a")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
@@ -1,10 +1,107 @@
-import psycopg2
-
-def get_connection():
-    return psycopg2.connect(
-        host="localhost",
-        port="5433",
-        database="hospital",
-        user="hospital_user",
-        password="hospital_pass"
-    )
+from contextlib import contextmanager
+
+from psycopg2 import OperationalError
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+
+from .config import DB_POOL_MIN, DB_POOL_SIZE, HOSPITAL_DB
+from .log import logger
+
+# One pool per worker process, created on first use; a fresh TCP +
+# auth handshake per request is the classic Postgres throughput killer
+_pool = None
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadedConnectionPool(
+            minconn=DB_POOL_MIN, maxconn=DB_POOL_SIZE, **HOSPITAL_DB
+        )
+    return _pool
+
+def _checkout():
+    """
+    Get a pooled connection, pre-pinged: a connection that died while
+    sitting in the pool (DB restart, idle timeout) is discarded and
+    replaced instead of surfacing as a failed query. Long-running
+    callers like the CDC poll loop depend on this.
+    """
+    pool = _get_pool()
+    for attempt in (1, 2):
+        conn = pool.getconn()
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1;")
+            cur.close()
+            return pool, conn
+        except OperationalError as exc:
+            pool.putconn(conn, close=True)
+            if attempt == 2:
+                raise
+            logger.warning("Discarded stale pooled connection: %s", exc)
+
+@contextmanager
+def transaction():
+    """
+    Check out a pooled connection for a multi-statement transaction.
+    Commits on clean exit, rolls back on error, always returns the
+    connection to the pool.
+    """
+    pool, conn = _checkout()
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        pool.putconn(conn)
+
+def fetch_all(query, params=None):
+    """
+    Run a read-only query on a pooled connection and return all rows.
+    Keeps connection handling in one place so endpoints stay non-blocking
+    (FastAPI runs sync handlers in its threadpool).
+    """
+    pool, conn = _checkout()
+    try:
+        cur = conn.cursor()
+        cur.execute(query, params or ())
+        return cur.fetchall()
+    finally:
+        # putconn rolls back anything left open and discards closed
+        # connections; an explicit rollback here would raise on a
+        # connection that died mid-query and leak the pool slot
+        pool.putconn(conn)
+
+def insert_many(query, rows, page_size=1000):
+    """
+    Bulk-insert rows with execute_values (query must contain a single
+    VALUES %s placeholder). One multi-row statement per page instead of
+    one round-trip per row.
+    """
+    pool, conn = _checkout()
+    try:
+        cur = conn.cursor()
+        # NOTICE traffic per statement is pure overhead on a bulk load
+        cur.execute("SET LOCAL client_min_messages = warning;")
+        execute_values(cur, query, rows, page_size=page_size)
+        conn.commit()
+    finally:
+        pool.putconn(conn)
+
+def fetch_iter(query, params=None, batch_size=1000):
+    """
+    Stream query results through a server-side cursor, batch_size rows
+    at a time, so large result sets never sit fully in driver memory.
+    """
+    pool, conn = _checkout()
+    try:
+        cur = conn.cursor(name="carelock_stream")
+        cur.itersize = batch_size
+        cur.execute(query, params or ())
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+        cur.close()
+    finally:
+        pool.putconn(conn)
@@ -1,3 +1,67 @@
+# Mappers take plain driver tuples, positionally. Keep it that way:
+# tuples cost nothing per attribute access, stay picklable for any
+# future worker-pool stage, and unpack in one bytecode op.
+#
+# They are also deliberately literal dict builds, not a config-driven
+# walk over target-path strings: each mapper is exactly the code a
+# path compiler or exec()-based codegen would emit, so there is no
+# per-record path parsing, transform lookup or setter indirection to
+# optimize away — and none of the debugging opacity generated code
+# brings.
+
+import re
+from datetime import date, datetime
+
+# Compiled once at module scope so the per-record check skips the re
+# cache lock; fullmatch keeps compound results like "120/80" as strings
+_NUMERIC_RESULT = re.compile(r"-?\d+(?:\.\d+)?")
+
+# Gender synonyms -> FHIR administrative-gender codes, built once;
+# anything unrecognized becomes "unknown" instead of leaking an
+# invalid code into the resource
+_GENDER = {
+    "m": "male", "male": "male", "man": "male",
+    "f": "female", "female": "female", "woman": "female",
+    "o": "other", "other": "other"
+}
+
+def map_many(mapper, rows):
+    """
+    Map a whole result set in one call. list(map(...)) keeps the loop
+    in C instead of interpreting a per-row comprehension frame, which
+    is the cheapest win available on the bulk sync paths. A pandas
+    column-wise rewrite was weighed and dropped: building a DataFrame
+    from row tuples and re-assembling nested dicts costs more than
+    these flat builds save, and it would add a heavyweight dependency
+    to a connector that ships to hospital hosts.
+    """
+    return list(map(mapper, rows))
+
+def iter_mapped(mapper, rows):
+    """
+    Lazily map a row stream: each resource is produced and consumed
+    before the next exists, so streaming consumers stay O(1) in memory
+    where map_many would hold the whole batch.
+    """
+    for row in rows:
+        yield mapper(row)
+
+def _format_date(value):
+    """
+    Format date-ish values for FHIR with exact-type dispatch. datetime
+    is checked before date (it subclasses date, so a plain isinstance
+    chain would drop the time part), and gets the 'T' separator where
+    str() would emit a space.
+    """
+    t = type(value)
+    if t is str:
+        return value
+    if t is datetime:
+        return value.strftime("%Y-%m-%dT%H:%M:%S")
+    if t is date:
+        return value.isoformat()
+    return str(value) if value is not None else None
+
 def map_patient(row):
     patient_id, name, gender, dob = row
 
@@ -9,8 +73,8 @@ def map_patient(row):
                 "text": name
             }
         ],
-        "gender": gender.lower(),
-        "birthDate": str(dob)
+        "gender": _GENDER.get(gender.lower(), "unknown") if gender else "unknown",
+        "birthDate": _format_date(dob)
     }
 
 def map_encounter(row):
@@ -23,7 +87,7 @@ def map_encounter(row):
             "reference": f"Patient/{patient_id}"
         },
         "period": {
-            "start": str(visit_date)
+            "start": _format_date(visit_date)
         },
         "reasonCode": [
             {
@@ -40,7 +104,7 @@ def map_encounter(row):
 def map_observation(row):
     lab_id, patient_id, test_name, result, test_date = row
 
-    return {
+    observation = {
         "resourceType": "Observation",
         "id": str(lab_id),
         "subject": {
@@ -49,6 +113,33 @@ def map_observation(row):
         "code": {
             "text": test_name
         },
-        "valueString": result,
-        "effectiveDateTime": str(test_date)
+        "effectiveDateTime": _format_date(test_date)
     }
+    # First-character check short-circuits the regex machinery for the
+    # common textual results ("Normal", "High", ...)
+    stripped = result.strip() if result else ""
+    if (
+        stripped
+        and (stripped[0].isdigit() or stripped[0] == "-")
+        and _NUMERIC_RESULT.fullmatch(stripped)
+    ):
+        observation["valueQuantity"] = {"value": float(stripped)}
+    else:
+        observation["valueString"] = result
+    return observation
+
+# table -> (primary key column, mapper, central resource type). The
+# one dispatch table both sync paths share, resolved once at import so
+# no caller re-looks-up mappers per record or per batch.
+TABLE_HANDLERS = {
+    "patients": ("patient_id", map_patient, "patient"),
+    "visits": ("visit_id", map_encounter, "encounter"),
+    "labs": ("lab_id", map_observation, "observation")
+}
+
+def register_handler(table, pk_column, mapper, resource_type):
+    """
+    Register an additional change-logged table; both the incremental
+    drain and the full sync pick it up without modification.
+    """
+    TABLE_HANDLERS[table] = (pk_column, mapper, resource_type)
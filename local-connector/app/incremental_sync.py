@@ -0,0 +1,225 @@
+import select
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+import psycopg2.extensions
+
+from .cdc import ChangeBatch, get_latest_change_id, iter_changes
+from .config import HOSPITAL_DB, TENANT_ID
+from .db import fetch_all, transaction
+from .fhir_mapper import TABLE_HANDLERS, map_many
+from .log import logger
+from .sync import _delete_batch, _push_batch
+
+# How long to sit after the first notification so the rest of a write
+# burst lands and the whole storm collapses into a single drain
+DEBOUNCE_SECONDS = 0.05
+
+# Advisory in-process copy of the durable cursor; lets the idle loop
+# skip a full claim-and-drain when the log sequence has not moved.
+# Correctness still rests on sync_cursor, this only gates the attempt.
+_last_drained_id = 0
+
+def _sync_table(table, ids):
+    """
+    Fetch the touched rows for one table and push them as one batch.
+    Returns the number of resources pushed.
+    """
+    pk_column, mapper, resource_type = TABLE_HANDLERS[table]
+    rows = fetch_all(
+        f"SELECT * FROM {table} WHERE {pk_column} = ANY(%s);",
+        (ids,)
+    )
+    _push_batch(resource_type, map_many(mapper, rows))
+    return len(rows)
+
+def _delete_table(table, ids):
+    """
+    Propagate deletions for one table in a single batched call.
+    Returns the number of resources removed.
+    """
+    _, _, resource_type = TABLE_HANDLERS[table]
+    _delete_batch(resource_type, ids)
+    return len(ids)
+
+def sync_incremental(batch=500):
+    """
+    Drain change-log entries recorded since the durable cursor and push
+    the affected rows to the central platform. The sync_cursor row is
+    claimed with FOR UPDATE SKIP LOCKED for the whole drain, so running
+    several workers never double-processes a change — a worker that
+    finds the cursor already claimed returns immediately. Returns the
+    number of resources pushed.
+    """
+    global _last_drained_id
+    synced = 0
+
+    with transaction() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "INSERT INTO sync_cursor (tenant_id) VALUES (%s) "
+            "ON CONFLICT DO NOTHING;",
+            (TENANT_ID,)
+        )
+        cur.execute(
+            "SELECT last_change_id FROM sync_cursor "
+            "WHERE tenant_id = %s FOR UPDATE SKIP LOCKED;",
+            (TENANT_ID,)
+        )
+        row = cur.fetchone()
+        if row is None:
+            # Another worker holds the cursor and is already draining
+            return 0
+        last_sync_id = row[0]
+
+        synced, last_sync_id = _drain(last_sync_id, batch)
+        _last_drained_id = last_sync_id
+
+        cur.execute(
+            "UPDATE sync_cursor "
+            "SET last_change_id = %s, updated_at = now() "
+            "WHERE tenant_id = %s;",
+            (last_sync_id, TENANT_ID)
+        )
+
+    return synced
+
+def _drain(last_sync_id, batch):
+    """
+    Run the actual drain loop from last_sync_id. Returns (resources
+    pushed, new last_sync_id).
+    """
+    synced = 0
+
+    while True:
+        # Stream events straight off the server-side cursor; only the
+        # per-table id lists are held in memory, never the raw batch
+        changes = ChangeBatch(
+            iter_changes(
+                since_id=last_sync_id,
+                limit=batch,
+                include_payload=False
+            ),
+            since_id=last_sync_id
+        )
+
+        # Compact the batch to terminal state per record: 50 UPDATEs to
+        # one patient become one push, and a record deleted after edits
+        # becomes one delete (walked in order, so the last op wins)
+        seen = 0
+        terminal = {}
+        for event in changes:
+            seen += 1
+            if event.table_name in TABLE_HANDLERS:
+                terminal[(event.table_name, event.record_id)] = event.operation
+        last_sync_id = changes.last_change_id
+        if not seen:
+            break
+
+        # Collect surviving ids per table, then fetch each table's rows
+        # in one ANY(ids) query instead of a round-trip per change;
+        # deleted records go to the batched delete endpoint instead
+        ids_by_table = {}
+        deletes_by_table = {}
+        for (table, record_id), operation in terminal.items():
+            if operation == "DELETE":
+                deletes_by_table.setdefault(table, []).append(record_id)
+            else:
+                ids_by_table.setdefault(table, []).append(record_id)
+
+        # Each table's fetch + push (or delete) is independent I/O, so
+        # overlap the tasks instead of paying the round-trips serially
+        tasks = [
+            (_sync_table, table, ids)
+            for table, ids in ids_by_table.items()
+        ] + [
+            (_delete_table, table, ids)
+            for table, ids in deletes_by_table.items()
+        ]
+        if len(tasks) > 1:
+            with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+                synced += sum(executor.map(
+                    lambda task: task[0](task[1], task[2]), tasks
+                ))
+        else:
+            for handler, table, ids in tasks:
+                synced += handler(table, ids)
+
+        if seen < batch:
+            break
+
+    return synced, last_sync_id
+
+def listen_forever(fallback_seconds=30, stop_event=None):
+    """
+    Event-driven sync loop: LISTEN on the channel the CDC trigger
+    notifies and only drain the log when something actually changed.
+    The timeout is a safety net, not the pickup mechanism, so an idle
+    database costs one SELECT every fallback_seconds instead of a
+    constant poll. Pass a threading.Event as stop_event to shut the
+    loop down cleanly; it is checked once per wakeup.
+    """
+    conn = psycopg2.connect(**HOSPITAL_DB)
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    cur = conn.cursor()
+    cur.execute("SELECT ensure_change_log_partitions();")
+    cur.execute("LISTEN data_changes;")
+    logger.info("Incremental sync listening on data_changes")
+
+    notified = True  # drain once on startup to catch any backlog
+    consecutive_empty = 0
+    last_ensure = time.monotonic()
+
+    while stop_event is None or not stop_event.is_set():
+        # A timeout wake with no notification is almost always a no-op;
+        # the O(1) sequence read is far cheaper than claiming the
+        # cursor and polling the log just to find nothing
+        synced = 0
+        if notified or get_latest_change_id() > _last_drained_id:
+            synced = sync_incremental()
+            if synced:
+                logger.info("Incremental sync pushed %s resources", synced)
+
+        # Re-run the partition pre-create at least once per fallback
+        # interval so a busy sequence cannot outrun the pre-created
+        # partitions between wakeups; when nothing needs creating the
+        # call is a handful of to_regclass probes
+        now = time.monotonic()
+        if now - last_ensure >= fallback_seconds:
+            cur.execute("SELECT ensure_change_log_partitions();")
+            last_ensure = now
+
+        # Park longer the longer the database stays quiet (doubling,
+        # capped at 10x); notifications still interrupt the wait
+        # immediately, so latency under load is unaffected
+        if synced:
+            consecutive_empty = 0
+        else:
+            consecutive_empty += 1
+        timeout = min(
+            fallback_seconds * (2 ** min(consecutive_empty, 4)),
+            fallback_seconds * 10
+        )
+
+        notified = False
+        if conn.notifies:
+            # The periodic pre-create executes on this connection,
+            # which absorbs any notifications that arrived during the
+            # drain into conn.notifies — the socket is then quiet, so
+            # select() alone would sit out the full timeout before
+            # picking them up
+            conn.notifies.clear()
+            notified = True
+            consecutive_empty = 0
+        elif select.select([conn], [], [], timeout) != ([], [], []):
+            # Debounce: wait out the burst, then discard every queued
+            # notification — any number of them means one drain
+            time.sleep(DEBOUNCE_SECONDS)
+            conn.poll()
+            conn.notifies.clear()
+            notified = True
+            consecutive_empty = 0
+
+if __name__ == "__main__":
+    listen_forever()
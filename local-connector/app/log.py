@@ -0,0 +1,19 @@
+import logging
+import logging.handlers
+import queue
+
+# Route log records through a queue so the emitting thread never blocks
+# on stdout; a single listener thread does the actual writing
+_queue = queue.SimpleQueue()
+
+_handler = logging.StreamHandler()
+_handler.setFormatter(
+    logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+)
+
+_listener = logging.handlers.QueueListener(_queue, _handler)
+_listener.start()
+
+logger = logging.getLogger("carelock")
+logger.setLevel(logging.INFO)
+logger.addHandler(logging.handlers.QueueHandler(_queue))
@@ -1,95 +1,248 @@
-from fastapi import FastAPI
-from fhir_mapper import map_patient, map_encounter, map_observation
-from db import get_connection
-
-app = FastAPI(title="CareLock Local Connector")
+import asyncio
+import time
+import uuid
+from datetime import datetime
+
+import orjson
+import hashlib
+
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from .cdc import are_cdc_enabled, get_changes, get_latest_change_id
+from .config import CENTRAL_API_URL
+from .fhir_mapper import iter_mapped, map_patient, map_encounter, map_observation
+from .db import fetch_all, fetch_iter
+from .schema import discover_schema, iter_schema
+
+# The sync module (requests + redis) is imported lazily inside the
+# handlers that need it so idle workers boot without it
+
+class TimingMiddleware:
+    """
+    Pure-ASGI timing middleware; BaseHTTPMiddleware adds an extra
+    request/response hop per call, this adds a header and nothing else.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                message["headers"].append(
+                    (b"x-process-time", f"{elapsed_ms:.2f}".encode())
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+app = FastAPI(title="CareLock Local Connector", default_response_class=ORJSONResponse)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+app.add_middleware(TimingMiddleware)
+
+# Response timestamps only need second resolution, so format the ISO
+# string once per second instead of on every request
+_now_cache = {"second": 0, "iso": ""}
+
+def now_iso():
+    second = int(time.time())
+    if second != _now_cache["second"]:
+        _now_cache["second"] = second
+        _now_cache["iso"] = datetime.utcfromtimestamp(second).isoformat()
+    return _now_cache["iso"]
 
 @app.get("/health")
 def health_check():
-    return {"status": "Local Connector is running"}
+    return {"status": "Local Connector is running", "timestamp": now_iso()}
+
+def _hospital_status(exact=False):
+    if exact:
+        # One round-trip for all table counts instead of one query per table
+        row = fetch_all("""
+            SELECT
+                (SELECT COUNT(*) FROM patients),
+                (SELECT COUNT(*) FROM visits),
+                (SELECT COUNT(*) FROM labs);
+        """)[0]
+        counts = {"patients": row[0], "visits": row[1], "labs": row[2]}
+    else:
+        # Planner estimates are good enough for a status page and skip
+        # the full-table scans that COUNT(*) needs
+        rows = fetch_all("""
+            SELECT relname, GREATEST(reltuples, 0)::BIGINT
+            FROM pg_class
+            WHERE relname IN ('patients', 'visits', 'labs');
+        """)
+        counts = {name: estimate for name, estimate in rows}
+
+    return {
+        "database": "connected",
+        "counts": counts,
+        "exact": exact
+    }
+
+def _central_status():
+    import requests
+
+    try:
+        response = requests.get(f"{CENTRAL_API_URL}/docs", timeout=3)
+        return {"reachable": response.status_code == 200}
+    except requests.RequestException:
+        return {"reachable": False}
+
+@app.get("/status")
+async def get_status(exact: bool = False):
+    # The hospital DB probe and the central API probe are independent
+    # I/O, so run them concurrently instead of back to back
+    hospital, central = await asyncio.gather(
+        run_in_threadpool(_hospital_status, exact),
+        run_in_threadpool(_central_status)
+    )
+
+    return {
+        "hospital_db": hospital,
+        "central_api": central,
+        "timestamp": now_iso()
+    }
 
 @app.get("/schema")
-def get_schema():
-    conn = get_connection()
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT table_name, column_name, data_type
-        FROM information_schema.columns
-        WHERE table_schema = 'public'
-        ORDER BY table_name;
-    """)
-
-    rows = cur.fetchall()
-    conn.close()
-
-    schema = {}
-    for table, column, dtype in rows:
-        schema.setdefault(table, []).append({
-            "column": column,
-            "type": dtype
-        })
-
-    return schema
+def get_schema(request: Request, refresh: bool = False):
+    # Serialize once, then let conditional requests short-circuit with
+    # 304s — schema metadata rarely changes between polls
+    body = orjson.dumps(discover_schema(refresh=refresh))
+    etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304)
+
+    return Response(
+        body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": "private, max-age=60"}
+    )
+
+@app.get("/schema/stream")
+def stream_schema(refresh: bool = False):
+    # One NDJSON line per table, so large schemas never sit fully
+    # serialized in memory and the client can parse incrementally
+    def generate():
+        for entry in iter_schema(refresh=refresh):
+            yield orjson.dumps(entry) + b"\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 
 @app.get("/patients")
 def get_patients():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM patients;")
-    rows = cur.fetchall()
-    conn.close()
-
-    return rows
+    return fetch_all("SELECT * FROM patients;")
 
 @app.get("/visits")
 def get_visits():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM visits;")
-    rows = cur.fetchall()
-    conn.close()
-
-    return rows
+    return fetch_all("SELECT * FROM visits;")
 
 @app.get("/labs")
 def get_labs():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM labs;")
-    rows = cur.fetchall()
-    conn.close()
+    return fetch_all("SELECT * FROM labs;")
+
+# Single dispatch table shared by the /fhir routes instead of one
+# hand-written handler per resource type
+FHIR_SOURCES = {
+    "patients": ("SELECT * FROM patients;", map_patient),
+    "encounters": ("SELECT * FROM visits;", map_encounter),
+    "observations": ("SELECT * FROM labs;", map_observation)
+}
+
+@app.get("/fhir/{resource_type}")
+def get_fhir_resources(resource_type: str):
+    source = FHIR_SOURCES.get(resource_type)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Unknown resource type")
+
+    query, mapper = source
+    return ORJSONResponse([mapper(row) for row in fetch_all(query)])
+
+@app.get("/fhir/{resource_type}/stream")
+def stream_fhir_resources(resource_type: str):
+    source = FHIR_SOURCES.get(resource_type)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Unknown resource type")
+
+    query, mapper = source
+
+    # One NDJSON line per resource, produced straight off the
+    # server-side cursor: memory stays flat however large the table is
+    def generate():
+        for resource in iter_mapped(mapper, fetch_iter(query)):
+            yield orjson.dumps(resource) + b"\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@app.get("/cdc/changes")
+def get_cdc_changes(since: int = 0, limit: int = 100, tables: str = None,
+                    operations: str = None, payload: bool = True):
+    changes = get_changes(
+        since_id=since,
+        limit=limit,
+        tables=tables.split(",") if tables else None,
+        operations=operations.split(",") if operations else None,
+        include_payload=payload
+    )
+    body = b"[" + b",".join(change.to_json() for change in changes) + b"]"
+    return Response(body, media_type="application/json")
+
+
+@app.get("/cdc/status")
+def get_cdc_status():
+    return are_cdc_enabled(["patients", "visits", "labs"])
+
+
+@app.get("/cdc/latest")
+def get_cdc_latest():
+    return {"latest_change_id": get_latest_change_id()}
+
+
+@app.post("/sync/full", status_code=202)
+def trigger_full_sync(background_tasks: BackgroundTasks):
+    from .sync import acquire_sync_lock, run_full_sync
 
-    return rows
+    sync_id = str(uuid.uuid4())
+    if not acquire_sync_lock(sync_id):
+        raise HTTPException(status_code=409, detail="Sync already running")
 
-@app.get("/fhir/patients")
-def get_fhir_patients():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM patients;")
-    rows = cur.fetchall()
-    conn.close()
+    # Run the push in the background so the caller is not held for the
+    # whole sync
+    background_tasks.add_task(run_full_sync, sync_id)
 
-    return [map_patient(row) for row in rows]
+    return {"status": "accepted", "sync_id": sync_id}
 
 
-@app.get("/fhir/encounters")
-def get_fhir_encounters():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM visits;")
-    rows = cur.fetchall()
-    conn.close()
+@app.get("/sync/status")
+def get_sync_status():
+    from .sync import get_sync_state
 
-    return [map_encounter(row) for row in rows]
+    return get_sync_state()
 
 
-@app.get("/fhir/observations")
-def get_fhir_observations():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM labs;")
-    rows = cur.fetchall()
-    conn.close()
+if __name__ == "__main__":
+    import os
+    import uvicorn
 
-    return [map_observation(row) for row in rows]
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=os.cpu_count(),
+        limit_concurrency=1000,
+        timeout_keep_alive=30
+    )
@@ -0,0 +1,91 @@
+import time
+
+from .db import fetch_all
+
+SCHEMA_QUERY = """
+    SELECT table_name, column_name, data_type
+    FROM information_schema.columns
+    WHERE table_schema = 'public'
+    ORDER BY table_name;
+"""
+
+# One batched catalog query per metadata kind (columns, PKs, FKs)
+# instead of per-table inspector round-trips
+PK_QUERY = """
+    SELECT tc.table_name, kcu.column_name
+    FROM information_schema.table_constraints tc
+    JOIN information_schema.key_column_usage kcu
+        ON tc.constraint_name = kcu.constraint_name
+        AND tc.table_schema = kcu.table_schema
+    WHERE tc.constraint_type = 'PRIMARY KEY'
+        AND tc.table_schema = 'public';
+"""
+
+FK_QUERY = """
+    SELECT tc.table_name, kcu.column_name,
+           ccu.table_name, ccu.column_name
+    FROM information_schema.table_constraints tc
+    JOIN information_schema.key_column_usage kcu
+        ON tc.constraint_name = kcu.constraint_name
+        AND tc.table_schema = kcu.table_schema
+    JOIN information_schema.constraint_column_usage ccu
+        ON tc.constraint_name = ccu.constraint_name
+        AND tc.table_schema = ccu.table_schema
+    WHERE tc.constraint_type = 'FOREIGN KEY'
+        AND tc.table_schema = 'public';
+"""
+
+# Schema metadata rarely changes, so cache it for a few minutes
+SCHEMA_CACHE_TTL = 300
+_schema_cache = {"schema": None, "loaded_at": 0.0}
+
+def discover_schema(refresh=False):
+    """
+    Read table/column/key metadata from the hospital DB and return it
+    as {table: {columns, primary_key, foreign_keys}}, using one
+    catalog query per metadata kind regardless of table count.
+
+    The result is cached for SCHEMA_CACHE_TTL seconds;
+    pass refresh=True to bypass and repopulate the cache.
+    """
+    now = time.monotonic()
+    if (
+        not refresh
+        and _schema_cache["schema"] is not None
+        and now - _schema_cache["loaded_at"] < SCHEMA_CACHE_TTL
+    ):
+        return _schema_cache["schema"]
+
+    schema = {}
+    for table, column, dtype in fetch_all(SCHEMA_QUERY):
+        schema.setdefault(
+            table,
+            {"columns": [], "primary_key": [], "foreign_keys": []}
+        )["columns"].append({
+            "column": column,
+            "type": dtype
+        })
+
+    for table, column in fetch_all(PK_QUERY):
+        if table in schema:
+            schema[table]["primary_key"].append(column)
+
+    for table, column, ref_table, ref_column in fetch_all(FK_QUERY):
+        if table in schema:
+            schema[table]["foreign_keys"].append({
+                "column": column,
+                "references_table": ref_table,
+                "references_column": ref_column
+            })
+
+    _schema_cache["schema"] = schema
+    _schema_cache["loaded_at"] = now
+    return schema
+
+def iter_schema(refresh=False):
+    """
+    Yield the schema one table at a time, for streaming responses.
+    """
+    schema = discover_schema(refresh=refresh)
+    for table, info in schema.items():
+        yield {"table": table, **info}
@@ -0,0 +1,150 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+import redis
+import requests
+
+from .config import API_TOKEN, CENTRAL_API_URL, REDIS_URL, TENANT_ID
+from .db import fetch_iter
+from .fhir_mapper import TABLE_HANDLERS, map_many
+from .log import logger
+
+# Sync state lives in Redis so every Uvicorn worker sees the same view;
+# a per-process dict would desync under multi-worker deployments
+_redis = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+
+SYNC_LOCK_KEY = "carelock:sync:lock"
+
+# Delete the lock only if this sync still owns it, in one atomic step
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+def acquire_sync_lock(sync_id):
+    # SET NX is atomic across workers, unlike a check-then-set on a flag
+    return bool(_redis.set(SYNC_LOCK_KEY, sync_id, nx=True, ex=3600))
+
+def release_sync_lock(sync_id):
+    _redis.eval(_RELEASE_LOCK, 1, SYNC_LOCK_KEY, sync_id)
+
+def is_syncing():
+    return _redis.exists(SYNC_LOCK_KEY) == 1
+
+def get_sync_state():
+    return {
+        "is_syncing": is_syncing(),
+        "last_sync": _redis.get("carelock:sync:last_sync"),
+        "last_sync_id": _redis.get("carelock:sync:last_sync_id"),
+        "total_syncs": int(_redis.get("carelock:sync:total") or 0)
+    }
+
+# One session for the whole push: keep-alive reuses the TCP connection
+# to the central API instead of a fresh handshake per resource
+_session = requests.Session()
+_session.headers.update({"Authorization": API_TOKEN})
+
+def _push_batch(resource_type, resources):
+    if not resources:
+        return
+    response = _session.post(
+        f"{CENTRAL_API_URL}/ingest/batch/{resource_type}/{TENANT_ID}",
+        json=resources,
+        timeout=30
+    )
+    response.raise_for_status()
+
+def _delete_batch(resource_type, ids, chunk=5000):
+    # Chunk very large deletes so the parameter array stays a sane size
+    for start in range(0, len(ids), chunk):
+        response = _session.post(
+            f"{CENTRAL_API_URL}/ingest/batch-delete/{resource_type}/{TENANT_ID}",
+            json=[str(resource_id) for resource_id in ids[start:start + chunk]],
+            timeout=30
+        )
+        response.raise_for_status()
+
+def _full_sync_sources():
+    # Derived from the shared dispatch table at call time so tables
+    # added via register_handler are included
+    return [
+        (resource_type, mapper, f"SELECT * FROM {table};")
+        for table, (_, mapper, resource_type) in TABLE_HANDLERS.items()
+    ]
+
+# Rows per extract/push batch: bounds working-set memory on big tables
+# and sits in Postgres's multi-row sweet spot
+FULL_SYNC_BATCH = 10000
+
+def _sync_source(resource_type, mapper, query, batch_size=FULL_SYNC_BATCH):
+    """
+    Stream one table off the server-side cursor and push it in bounded
+    batches, so a million-row table never sits in memory at once.
+
+    Extract+map feeds a bounded queue while a loader thread does the
+    HTTP pushes, so the next batch is being mapped while the previous
+    one is on the wire instead of the stages running back to back.
+    """
+    batches = queue.Queue(maxsize=2)
+    errors = []
+
+    def _loader():
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            if not errors:
+                try:
+                    _push_batch(resource_type, batch)
+                except Exception as exc:
+                    # Keep consuming so the producer never blocks on a
+                    # full queue; the error is re-raised after join
+                    errors.append(exc)
+
+    loader = threading.Thread(target=_loader)
+    loader.start()
+    try:
+        rows = fetch_iter(query, batch_size=batch_size)
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            batches.put(map_many(mapper, chunk))
+    finally:
+        batches.put(None)
+        loader.join()
+    if errors:
+        raise errors[0]
+
+def run_full_sync(sync_id):
+    """
+    Push every patient, visit and lab from the hospital DB to the
+    central platform as FHIR resources. Runs as a background task so
+    the trigger endpoint can return immediately.
+    """
+    try:
+        # The three streams are independent and dominated by DB/HTTP
+        # waits, so run them concurrently; mapping is cheap enough that
+        # threads beat a process pool once pickling is counted
+        sources = _full_sync_sources()
+        with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+            futures = [
+                executor.submit(_sync_source, *source)
+                for source in sources
+            ]
+            for future in futures:
+                future.result()
+
+        _redis.set("carelock:sync:last_sync", str(datetime.utcnow()))
+        _redis.set("carelock:sync:last_sync_id", sync_id)
+        _redis.incr("carelock:sync:total")
+        logger.info("Full sync %s completed", sync_id)
+    except requests.RequestException as exc:
+        logger.error("Full sync %s failed: %s", sync_id, exc)
+    finally:
+        release_sync_lock(sync_id)
@@ -20,28 +20,33 @@ def fetch_fhir_patients():
     conn.close()
     return rows
 
+# Fixed text skeleton built once; per record only the three values are
+# substituted
+_PATIENT_TEXT = (
+    "Patient Name: {}\n"
+    "Gender: {}\n"
+    "Date of Birth: {}\n"
+)
+
 def fhir_patient_to_text(patient):
     """
     Convert FHIR Patient resource to readable clinical text
     """
-    name = patient.get("name", [{}])[0].get("text", "Unknown")
-    gender = patient.get("gender", "Unknown")
-    dob = patient.get("birthDate", "Unknown")
-
-    text = (
-        f"Patient Name: {name}\n"
-        f"Gender: {gender}\n"
-        f"Date of Birth: {dob}\n"
+    return _PATIENT_TEXT.format(
+        patient.get("name", [{}])[0].get("text", "Unknown"),
+        patient.get("gender", "Unknown"),
+        patient.get("birthDate", "Unknown")
     )
-    return text
 
 if __name__ == "__main__":
     patients = fetch_fhir_patients()
 
     print("\n--- FHIR PATIENT RECORDS ---\n")
 
-    for row in patients:
-        patient_resource = row[0]   # JSONB comes as dict
-        readable_text = fhir_patient_to_text(patient_resource)
-        print(readable_text)
-        print("-" * 40)
+    # One buffered write for the whole dump instead of two flushing
+    # print calls per record (JSONB comes back as a dict)
+    separator = "-" * 40
+    print("\n".join(
+        fhir_patient_to_text(row[0]) + "\n" + separator
+        for row in patients
+    ))
@@ -1,20 +1,25 @@
 from db_reader import fetch_fhir_patients, fhir_patient_to_text
 from langchain.vectorstores import Chroma
 from langchain.embeddings import HuggingFaceEmbeddings
+import hashlib
 import os
 
 # Directory where vectors will be stored
 VECTOR_DB_DIR = "../vector_db"
 
+def _document_id(text):
+    """
+    Stable content-addressed id. Python's hash() is salted per process,
+    so ids built from it would duplicate the store on every rebuild.
+    """
+    return "p_" + hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
 def build_vector_store():
     print("Loading FHIR patient data from central DB...")
     rows = fetch_fhir_patients()
 
-    documents = []
-    for row in rows:
-        patient_resource = row[0]
-        text = fhir_patient_to_text(patient_resource)
-        documents.append(text)
+    # One comprehension instead of per-row append bookkeeping
+    documents = [fhir_patient_to_text(row[0]) for row in rows]
 
     print(f"Total documents prepared: {len(documents)}")
 
@@ -23,15 +28,29 @@ def build_vector_store():
         model_name="sentence-transformers/all-MiniLM-L6-v2"
     )
 
-    # Create / persist ChromaDB
-    vectordb = Chroma.from_texts(
-        documents,
-        embedding=embeddings,
-        persist_directory=VECTOR_DB_DIR
+    vectordb = Chroma(
+        persist_directory=VECTOR_DB_DIR,
+        embedding_function=embeddings
     )
 
+    # Content-addressed ids make re-ingest a diff: only documents not
+    # already in the store pay the embedding model, so re-running the
+    # build after a sync costs proportional to what changed
+    ids = [_document_id(text) for text in documents]
+    existing = set(vectordb._collection.get()["ids"])
+    new_texts = [
+        text for text, doc_id in zip(documents, ids)
+        if doc_id not in existing
+    ]
+    new_ids = [doc_id for doc_id in ids if doc_id not in existing]
+
+    if new_texts:
+        vectordb.add_texts(new_texts, ids=new_ids)
     vectordb.persist()
-    print("✅ Vector store created successfully!")
+    print(
+        f"✅ Vector store updated: {len(new_texts)} new, "
+        f"{len(documents) - len(new_texts)} already present"
+    )
 
 if __name__ == "__main__":
     build_vector_store()
@@ -4,34 +4,78 @@ from transformers import pipeline
 
 VECTOR_DB_DIR = "../vector_db"
 
-def load_vector_store():
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
-    )
+# Loading the embedding model and the LLM takes seconds each; keep
+# both resident per process so repeated loads are free
+_vectordb = None
+_llm = None
 
-    vectordb = Chroma(
-        persist_directory=VECTOR_DB_DIR,
-        embedding_function=embeddings
-    )
-
-    return vectordb
+def load_vector_store():
+    global _vectordb
+    if _vectordb is None:
+        embeddings = HuggingFaceEmbeddings(
+            model_name="sentence-transformers/all-MiniLM-L6-v2"
+        )
+        _vectordb = Chroma(
+            persist_directory=VECTOR_DB_DIR,
+            embedding_function=embeddings
+        )
+    return _vectordb
 
 def load_llm():
     """
     Lightweight local text-generation model
     """
-    return pipeline(
-        "text-generation",
-        model="google/flan-t5-base",
-        max_length=256
-    )
-
-def ask_question(vectordb, llm, question):
-    docs = vectordb.similarity_search(question, k=2)
-
-    context = "\n".join([doc.page_content for doc in docs])
-
-    prompt = f"""
+    global _llm
+    if _llm is None:
+        _llm = pipeline(
+            "text-generation",
+            model="google/flan-t5-base",
+            max_length=256
+        )
+    return _llm
+
+# Cache retrieved docs per normalized question: a repeat question
+# skips the embedding forward pass and ANN probe, which dominate the
+# cost of a query
+_search_cache = {}
+_SEARCH_CACHE_MAX = 1024
+
+def _retrieve_context(vectordb, question, k=2):
+    key = question.strip().lower()
+    docs = _search_cache.get(key)
+    if docs is None:
+        docs = vectordb.similarity_search(question, k=k)
+        if len(_search_cache) >= _SEARCH_CACHE_MAX:
+            _search_cache.clear()
+        _search_cache[key] = docs
+    return docs
+
+def _retrieve_context_many(vectordb, questions, k=2):
+    """
+    Retrieve context for several questions with one embedder forward
+    pass: the model embeds the whole list in a single batch, then each
+    vector runs the (comparatively cheap) ANN probe. Returns docs in
+    question order.
+    """
+    missing = []
+    for question in questions:
+        if question.strip().lower() not in _search_cache:
+            missing.append(question)
+
+    if missing:
+        vectors = vectordb._embedding_function.embed_documents(missing)
+        for question, vector in zip(missing, vectors):
+            if len(_search_cache) >= _SEARCH_CACHE_MAX:
+                _search_cache.clear()
+            _search_cache[question.strip().lower()] = (
+                vectordb.similarity_search_by_vector(vector, k=k)
+            )
+
+    return [_search_cache[question.strip().lower()] for question in questions]
+
+# Fixed instruction block built once; per question only the context
+# and question slots are filled in
+_PROMPT_TEMPLATE = """
 You are a clinical assistant.
 Answer ONLY using the context below.
 If the answer is not in the context, say "Not available in hospital data".
@@ -45,9 +89,31 @@ Question:
 Answer:
 """
 
+def _build_prompt(docs, question):
+    return _PROMPT_TEMPLATE.format(
+        context="\n".join([doc.page_content for doc in docs]),
+        question=question
+    )
+
+def ask_question(vectordb, llm, question):
+    prompt = _build_prompt(_retrieve_context(vectordb, question), question)
     response = llm(prompt)[0]["generated_text"]
     return response
 
+def ask_many(vectordb, llm, questions):
+    """
+    Answer a list of questions in one model invocation. The pipeline
+    batches a list of prompts through the model, amortizing the
+    per-call generation overhead instead of one forward pass each.
+    """
+    contexts = _retrieve_context_many(vectordb, questions)
+    prompts = [
+        _build_prompt(docs, question)
+        for docs, question in zip(contexts, questions)
+    ]
+    responses = llm(prompts)
+    return [response[0]["generated_text"] for response in responses]
+
 if __name__ == "__main__":
     print("🔍 Loading vector store...")
     vectordb = load_vector_store()